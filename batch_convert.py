@@ -1,87 +1,218 @@
 import os
+import sys
+import shlex
+import logging
+import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# Windows下不为每个 danmu2ass 子进程分配控制台窗口
+CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+
+# 固定处理E:\video文件夹
+FOLDER_PATH = r"E:\video"
+
+# danmu2ass.exe 的路径
+DANMU2ASS_PATH = r".\danmu2ass-windows\danmu2ass.exe"
+
+# 预设参数（模块级元组，避免每个任务重复构建）
+PARAMS = (
+    "--width", "1920",
+    "--height", "1080",
+    "--float-percentage", "0.35",
+    "--font-size", "32",
+    "--width-ratio", "1.2",
+    "--horizontal-gap", "20",
+    "--lane-size", "32",
+    "--font", "黑体",
+    "--bold",
+    "--outline", "0.8",
+    "--alpha", "0.76",
+    "--duration", "15",
+    "--no-web"  # 使用CLI模式
+)
+
+
+def iter_xml(directory):
+    """
+    递归查找目录下的XML文件
+
+    使用 os.scandir 复用目录项自带的类型信息，避免 os.walk 对每个条目额外 stat；
+    无法访问的目录会被跳过
+    """
+    try:
+        it = os.scandir(directory)
+    except OSError as e:
+        logger.warning("跳过无法访问的目录 %s: %s", directory, e)
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_xml(entry.path)
+            elif entry.name.lower().endswith('.xml') and entry.is_file():
+                yield entry.path
+
+
+def is_up_to_date(xml_file):
+    """对应的ASS文件存在且不早于XML文件时，无需重新转换"""
+    ass_file = os.path.splitext(xml_file)[0] + '.ass'
+    try:
+        return os.stat(ass_file).st_mtime >= os.stat(xml_file).st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def build_command(xml_file):
+    """
+    构建单个XML文件的 danmu2ass 命令
+
+    Returns:
+        (命令参数列表, 输出ASS文件路径)
+    """
+    # 构建输出文件名（将.xml替换为.ass）
+    output_file = os.path.splitext(xml_file)[0] + '.ass'
+    return [DANMU2ASS_PATH, *PARAMS, "-o", output_file, xml_file], output_file
+
+
+def convert_one(xml_file, verbose=False):
+    """
+    转换单个XML文件为ASS文件
+
+    danmu2ass 的标准输出不会被使用，直接丢弃；只有 verbose 时才收集错误输出。
+    结果通过 logger 输出，消息只在真正输出时才格式化
+
+    Returns:
+        是否成功
+    """
+    name = os.path.basename(xml_file)
+    try:
+        cmd, output_file = build_command(xml_file)
+
+        logger.info("正在转换: %s", name)
+
+        # 执行转换命令
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE if verbose else subprocess.DEVNULL,
+                                text=True, encoding='utf-8',
+                                close_fds=True, creationflags=CREATION_FLAGS)
+
+        if result.returncode == 0:
+            logger.info("✓ 成功转换: %s -> %s", name, os.path.basename(output_file))
+            return True
+        if verbose:
+            logger.error("✗ 转换失败: %s\n  错误信息: %s", name, result.stderr)
+        else:
+            logger.error("✗ 转换失败: %s (返回码 %d，使用 --verbose 查看错误信息)",
+                         name, result.returncode)
+        return False
+
+    except Exception as e:
+        logger.error("✗ 处理文件时出错 %s: %s", name, e)
+        return False
+
+
+def convert_folder(folder_path):
+    """
+    一次性调用 danmu2ass 转换整个文件夹（danmu2ass 会递归转换其下所有XML），
+    避免为每个文件重复支付进程启动开销
+
+    Returns:
+        (是否成功, 结果信息)
+    """
+    cmd = [DANMU2ASS_PATH, *PARAMS, folder_path]
+    try:
+        result = subprocess.run(cmd)
+    except Exception as e:
+        return False, f"✗ 批量转换出错: {str(e)}"
+    if result.returncode == 0:
+        return True, f"✓ 批量转换完成: {folder_path}"
+    return False, f"✗ 批量转换失败: {folder_path} (返回码 {result.returncode})"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="批量转换XML弹幕文件为ASS文件")
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="并行转换的任务数（默认: min(8, CPU核数)）")
+    parser.add_argument("--batch", action="store_true",
+                        help="只启动一次 danmu2ass，以文件夹模式转换全部XML")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="转换失败时显示 danmu2ass 的错误信息")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="重新转换所有XML，即使ASS文件已是最新")
+    parser.add_argument("--dry-run-commands", action="store_true",
+                        help="不执行转换，只逐行输出每个XML的转换命令，"
+                             "可交给 xargs -P / GNU parallel 并行执行")
+    return parser.parse_args()
+
 
 def main():
     """
     批量转换E:\video文件夹中的XML弹幕文件为ASS文件
     """
-    # 固定处理E:\video文件夹
-    folder_path = r"E:\video"
-    
-    # danmu2ass.exe 的路径
-    danmu2ass_path = r".\danmu2ass-windows\danmu2ass.exe"
-    
+    args = parse_args()
+    folder_path = FOLDER_PATH
+
+    # 工作线程通过 logger 输出，与 print 使用同一个流，保证顺序一致
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+
     # 检查danmu2ass.exe是否存在
-    if not os.path.exists(danmu2ass_path):
-        print(f"错误: 找不到 danmu2ass.exe 文件: {danmu2ass_path}")
+    if not os.path.exists(DANMU2ASS_PATH):
+        print(f"错误: 找不到 danmu2ass.exe 文件: {DANMU2ASS_PATH}")
         return
-    
+
     # 检查输入文件夹是否存在
     if not os.path.exists(folder_path):
         print(f"错误: 文件夹不存在: {folder_path}")
         return
-    
-    # 预设参数
-    params = [
-        "--width", "1920",
-        "--height", "1080", 
-        "--float-percentage", "0.35",
-        "--font-size", "32",
-        "--width-ratio", "1.2",
-        "--horizontal-gap", "20",
-        "--lane-size", "32",
-        "--font", "黑体",
-        "--bold",
-        "--outline", "0.8",
-        "--alpha", "0.76",
-        "--duration", "15",
-        "--no-web"  # 使用CLI模式
-    ]
-    
-    # 查找所有XML文件
-    xml_files = []
-    for root, dirs, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith('.xml'):
-                xml_files.append(os.path.join(root, file))
-    
-    if not xml_files:
-        print(f"在文件夹 {folder_path} 中没有找到XML文件")
+
+    if args.dry_run_commands:
+        # 只输出命令，便于管道交给外部并行工具
+        for xml_file in iter_xml(folder_path):
+            if args.force or not is_up_to_date(xml_file):
+                print(shlex.join(build_command(xml_file)[0]))
+        return
+
+    if args.batch:
+        ok, message = convert_folder(folder_path)
+        print(message)
         return
-    
-    print(f"找到 {len(xml_files)} 个XML文件，开始转换...")
-    
+
+    print(f"正在查找XML文件并开始转换（{args.jobs} 个并行任务）...")
+
     success_count = 0
     failed_count = 0
-    
-    for xml_file in xml_files:
-        try:
-            # 构建输出文件名（将.xml替换为.ass）
-            output_file = xml_file.rsplit('.', 1)[0] + '.ass'
-            
-            # 构建完整的命令
-            cmd = [danmu2ass_path] + params + ["-o", output_file, xml_file]
-            
-            print(f"正在转换: {os.path.basename(xml_file)}")
-            
-            # 执行转换命令
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-            
-            if result.returncode == 0:
-                print(f"✓ 成功转换: {os.path.basename(xml_file)} -> {os.path.basename(output_file)}")
+    skipped_count = 0
+    found_count = 0
+
+    # subprocess.run 等待子进程时会释放GIL，线程池即可让多个 danmu2ass 并行运行
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as ex:
+        # 边查找边提交，转换与目录遍历重叠进行
+        futures = {}
+        for xml_file in iter_xml(folder_path):
+            found_count += 1
+            # ASS比XML新则跳过，增量运行时只转换有变化的文件
+            if not args.force and is_up_to_date(xml_file):
+                skipped_count += 1
+                continue
+            futures[ex.submit(convert_one, xml_file, args.verbose)] = xml_file
+
+        if not found_count:
+            print(f"在文件夹 {folder_path} 中没有找到XML文件")
+            return
+
+        print(f"找到 {found_count} 个XML文件，其中 {skipped_count} 个已是最新")
+        for future in as_completed(futures):
+            if future.result():
                 success_count += 1
             else:
-                print(f"✗ 转换失败: {os.path.basename(xml_file)}")
-                print(f"  错误信息: {result.stderr}")
                 failed_count += 1
-                
-        except Exception as e:
-            print(f"✗ 处理文件时出错 {os.path.basename(xml_file)}: {str(e)}")
-            failed_count += 1
-    
+
     print(f"\n转换完成!")
     print(f"成功: {success_count} 个文件")
     print(f"失败: {failed_count} 个文件")
+    print(f"跳过: {skipped_count} 个文件（已是最新）")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,5 +1,58 @@
 import os
-import glob
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 并行删除的线程数，让多个删除请求同时在途（网络盘上效果明显）
+DELETE_WORKERS = 16
+
+def iter_merged_ass_files(directory):
+    """
+    递归查找目录下的.merged.ass文件，跳过无法访问的目录
+
+    Args:
+        directory (str): 要扫描的目录路径
+    """
+    try:
+        it = os.scandir(directory)
+    except OSError as e:
+        print(f"跳过无法访问的目录 {directory}: {e}")
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_merged_ass_files(entry.path)
+            elif entry.name.endswith('.merged.ass') and entry.is_file():
+                yield entry.path
+
+def _safe_remove(file_path):
+    """
+    删除单个文件
+
+    Returns:
+        (文件路径, 失败时的异常，成功时为None)
+    """
+    try:
+        os.remove(file_path)
+        return file_path, None
+    except OSError as e:
+        return file_path, e
+
+def remove_files(file_paths):
+    """
+    使用线程池边遍历边删除文件，在途任务数保持在 DELETE_WORKERS 的两倍以内，
+    因此 file_paths 可以是惰性的生成器，无需先收集完整列表
+
+    Yields:
+        (文件路径, 失败时的异常，成功时为None)
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as ex:
+        for file_path in file_paths:
+            pending.append(ex.submit(_safe_remove, file_path))
+            if len(pending) >= DELETE_WORKERS * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 def delete_merged_ass_files(directory):
     """
@@ -8,38 +61,44 @@ def delete_merged_ass_files(directory):
     Args:
         directory (str): 要扫描的目录路径
     """
-    # 使用glob递归搜索所有.merged.ass文件
-    pattern = os.path.join(directory, "**", "*.merged.ass")
-    merged_ass_files = glob.glob(pattern, recursive=True)
-    
-    if not merged_ass_files:
-        print("未找到任何.merged.ass文件")
-        return
-    
-    print(f"\n找到 {len(merged_ass_files)} 个.merged.ass文件")
-    
-    # 询问是否显示文件列表
-    show_list = input("是否显示所有文件列表? (y/N): ").lower().strip()
+    # 询问是否先显示文件列表
+    show_list = input("是否先显示所有文件列表? (y/N): ").lower().strip()
     
     if show_list == 'y' or show_list == 'yes':
+        # 需要展示列表时才一次性收集所有文件
+        merged_ass_files = list(iter_merged_ass_files(directory))
+        
+        if not merged_ass_files:
+            print("未找到任何.merged.ass文件")
+            return
+        
+        print(f"\n找到 {len(merged_ass_files)} 个.merged.ass文件")
         print("\n文件列表:")
         for i, file in enumerate(merged_ass_files, 1):
             print(f"  {i}. {file}")
-    
-    # 询问用户确认删除
-    confirm = input(f"\n是否确认删除这 {len(merged_ass_files)} 个文件? (y/N): ").lower().strip()
+        
+        confirm = input(f"\n是否确认删除这 {len(merged_ass_files)} 个文件? (y/N): ").lower().strip()
+    else:
+        # 否则边扫描边删除，第一个文件找到后即开始删除
+        merged_ass_files = iter_merged_ass_files(directory)
+        confirm = input("\n是否确认删除该目录下所有.merged.ass文件? (y/N): ").lower().strip()
     
     if confirm == 'y' or confirm == 'yes':
+        # 只输出失败的文件，避免大量逐行打印拖慢删除
+        found_count = 0
         deleted_count = 0
-        for file_path in merged_ass_files:
-            try:
-                os.remove(file_path)
-                print(f"已删除: {file_path}")
+        for file_path, error in remove_files(merged_ass_files):
+            found_count += 1
+            if error is None:
                 deleted_count += 1
-            except OSError as e:
-                print(f"删除失败 {file_path}: {e}")
+            else:
+                print(f"删除失败 {file_path}: {error}")
+        
+        if not found_count:
+            print("未找到任何.merged.ass文件")
+            return
         
-        print(f"\n成功删除 {deleted_count} 个文件")
+        print(f"\n找到 {found_count} 个文件，成功删除 {deleted_count} 个文件")
     else:
         print("取消删除操作")
 
@@ -5,67 +5,270 @@
 使用yt-dlp下载配置文件中指定的视频
 """
 
+import re
 import json
 import os
 import sys
-import subprocess
+import argparse
 import logging
-from pathlib import Path
-from typing import Dict, List, Any
-
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('download.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+import atexit
+import queue
+import time
+import shlex
+import shutil
+from collections import defaultdict
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import urlparse
+from typing import Awaitable, Dict, List, Any, Optional, Sequence, Set, Tuple
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时退回标准库json
+    orjson = None
+
+# 设置日志：各处只把记录放入队列，由后台监听线程统一写文件和终端，
+# 并发下载时不会因为文件锁和逐行刷盘相互阻塞
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_log_handlers = [
+    logging.FileHandler('download.log', encoding='utf-8'),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[QueueHandler(_log_queue)])
 logger = logging.getLogger(__name__)
 
+# 有效的下载URL
+_URL_RE = re.compile(r'^https?://')
+
+# 批量粘贴时每行的格式: URL [# 描述]
+_PASTE_LINE_RE = re.compile(r'^\s*(https?://\S+)(?:[^\S\n]+#?[^\S\n]*(.*))?$', re.MULTILINE)
+
+# 日志和列表输出中使用的分隔线
+_SEP50 = '=' * 50
+_SEP80 = '=' * 80
+_DASH80 = '-' * 80
+
+# 默认同时运行的yt-dlp进程数
+DEFAULT_CONCURRENCY = 3
+
+# 未配置输出模板时使用的模板（与yt-dlp默认值相同）
+DEFAULT_OUTPUT_TEMPLATE = '%(title)s [%(id)s].%(ext)s'
+
+# 子进程环境：让yt-dlp（及其后处理中调用的Python脚本）不缓冲输出并使用UTF-8
+CHILD_ENV = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'}
+
+# 读取子进程输出时单行的最大长度
+STREAM_LIMIT = 1 << 20
+
+# 默认每个站点每秒最多启动的下载数
+DEFAULT_PER_HOST_RPS = 0.5
+
+# 配置了外部下载器但未指定 external_downloader_args 时使用的参数
+DEFAULT_EXTERNAL_DOWNLOADER_ARGS = {
+    'aria2c': '-x 16 -s 16',
+}
+
+# asyncio 导入较慢，由下载的同步入口通过 _import_asyncio() 导入后绑定到模块全局名称，
+# 各协程直接使用；list/add 等交互命令启动时无需加载
+asyncio: Any = None
+
+def _import_asyncio() -> Any:
+    """导入asyncio并绑定到模块全局名称 asyncio"""
+    global asyncio
+    import asyncio
+    return asyncio
+
+class Throttler:
+    """令牌桶限速器：每秒最多放行 rate 次调用，rate <= 0 表示不限速"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def __call__(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def _loads(data: bytes) -> Any:
+    """解析UTF-8编码的JSON，优先使用orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _dumps(obj: Any) -> bytes:
+    """序列化为UTF-8编码的JSON，优先使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False, indent=4) + '\n').encode('utf-8')
+
+@lru_cache(maxsize=1)
+def _yt_dlp_version(executable: str) -> Optional[str]:
+    """
+    获取yt-dlp版本，未安装时返回None；每个进程只检查一次
+    
+    只在PATH中查找可执行文件并从当前环境的包元数据读取版本，不启动yt-dlp进程
+    """
+    if shutil.which(executable) is None:
+        return None
+    import importlib.metadata
+    try:
+        return importlib.metadata.version('yt-dlp')
+    except importlib.metadata.PackageNotFoundError:
+        # 独立安装的yt-dlp（如yt-dlp.exe）没有包元数据
+        return '未知'
+
+# yt-dlp写出的附属文件: <名称>.<缩略图扩展名>、<名称>.<语言>.<字幕扩展名>、<名称>.info.json、<名称>.description
+_THUMBNAIL_EXTS = frozenset({'jpg', 'jpeg', 'png', 'webp'})
+_SUBTITLE_EXTS = frozenset({'srt', 'vtt', 'ass', 'ssa', 'lrc', 'ttml', 'xml', 'json3', 'srv1', 'srv2', 'srv3'})
+
+def _is_sidecar(name: str, stem: str) -> bool:
+    """
+    判断文件名是否为 stem 对应媒体文件的附属文件
+    
+    只接受yt-dlp的附属文件命名形式，避免 "Part 1" 匹配到 "Part 1.5.mp4" 等其他视频
+    """
+    if not name.startswith(stem + '.'):
+        return False
+    rest = name[len(stem) + 1:]
+    if rest in ('info.json', 'description'):
+        return True
+    parts = rest.split('.')
+    if len(parts) == 1:
+        return parts[0].lower() in _THUMBNAIL_EXTS
+    return len(parts) == 2 and bool(parts[0]) and parts[1].lower() in _SUBTITLE_EXTS
+
+def _normalize_url_entry(url_config: Any, group_description: str, position: int) -> Tuple[str, str]:
+    """
+    把URL配置（旧格式字符串或新格式字典）统一为 (url, 描述)
+    
+    url 缺失、为null或条目格式不对时返回空URL，由调用方按无效URL处理
+    """
+    default_description = f"{group_description} - {position}"
+    if isinstance(url_config, str):
+        return url_config.strip(), default_description
+    if not isinstance(url_config, dict):
+        return '', default_description
+    return ((url_config.get('url') or '').strip(),
+            url_config.get('description') or default_description)
+
 class VideoDownloader:
-    def __init__(self, config_file: str = "config.json"):
+    # 进程内的配置缓存: 配置文件绝对路径 -> ((mtime_ns, 大小), 解析结果)
+    _config_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+    
+    def __init__(self, config_file: str = "config.json", concurrency: Optional[int] = None):
         """
         初始化视频下载器
         
         Args:
             config_file: 配置文件路径
+            concurrency: 同时运行的yt-dlp进程数，未指定时读取 yt_dlp_options.concurrency
         """
         self.config_file = config_file
         self.config = self.load_config()
+        self._build_indexes()
+        if concurrency is None:
+            concurrency = (self.config.get('yt_dlp_options') or {}).get('concurrency')
+            if concurrency is None:
+                concurrency = DEFAULT_CONCURRENCY
+        self.concurrency = max(1, int(concurrency))
+        # 已创建过的下载路径
+        self._mkdir_cache: Set[str] = set()
+        # 下载路径 -> 是否可写
+        self._writable_cache: Dict[str, bool] = {}
+        # 只解析一次yt-dlp的完整路径，避免每次启动进程都在PATH中查找
+        self._yt_dlp = shutil.which('yt-dlp') or 'yt-dlp'
+        # yt-dlp选项在运行期间不变，初始化时一次性解析为固定参数，
+        # 之后每个URL只需拼接输出路径和URL
+        options = self.config.get('yt_dlp_options') or {}
+        self._fixed_args = self._resolve_fixed_args(options)
+        self._output_template: str = options.get('output_template') or DEFAULT_OUTPUT_TEMPLATE
+        # 按站点限速，避免并发请求同一站点触发429，不同站点之间仍并行
+        per_host_rps = self.config.get('per_host_rps')
+        per_host_rps = float(DEFAULT_PER_HOST_RPS if per_host_rps is None else per_host_rps)
+        self._host_throttlers: Dict[str, Throttler] = defaultdict(lambda: Throttler(per_host_rps))
         
     def load_config(self) -> Dict[str, Any]:
-        """加载配置文件"""
+        """
+        加载配置文件
+        
+        同一进程中配置文件的修改时间和大小未变化时，直接复用已解析的结果，只需一次stat
+        """
+        cache_path = os.path.abspath(self.config_file)
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            logger.info(f"成功加载配置文件: {self.config_file}")
+            st = os.stat(self.config_file)
+            cached = self._config_cache.get(cache_path)
+            if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+                logger.info("成功加载配置文件: %s", self.config_file)
+                return cached[1]
+            
+            # 以二进制读取，由解析器直接处理UTF-8
+            with open(self.config_file, 'rb') as f:
+                data = f.read()
+                st = os.fstat(f.fileno())
+            config = _loads(data)
+            self._config_cache[cache_path] = ((st.st_mtime_ns, st.st_size), config)
+            logger.info("成功加载配置文件: %s", self.config_file)
             return config
         except FileNotFoundError:
-            logger.error(f"配置文件不存在: {self.config_file}")
+            logger.error("配置文件不存在: %s", self.config_file)
             sys.exit(1)
         except json.JSONDecodeError as e:
-            logger.error(f"配置文件格式错误: {e}")
+            logger.error("配置文件格式错误: %s", e)
             sys.exit(1)
             
+    def _build_indexes(self) -> None:
+        """
+        建立配置组描述 -> 配置组、下载路径 -> 描述的索引，查找配置组时无需遍历列表；
+        同时把每个配置组的URL统一整理为 (url, 描述) 列表，并记录无效URL的位置
+        """
+        self._by_desc: Dict[str, Dict[str, Any]] = {}
+        self._paths: Dict[str, str] = {}
+        self._normalized: Dict[int, List[Tuple[str, str]]] = {}
+        self._invalid_urls: Dict[int, List[int]] = {}
+        for i, config in enumerate(self.config.get('download_configs') or []):
+            desc = (config.get('description') or '').strip()
+            path = (config.get('download_path') or '').strip()
+            if desc and path:
+                self._by_desc.setdefault(desc, config)
+                self._paths.setdefault(path, desc)
+            
+            group_description = config.get('description') or '未知'
+            valid: List[Tuple[str, str]] = []
+            invalid: List[int] = []
+            for j, url_config in enumerate(config.get('urls') or [], 1):
+                url, url_description = _normalize_url_entry(url_config, group_description, j)
+                if _URL_RE.match(url):
+                    valid.append((url, url_description))
+                else:
+                    invalid.append(j)
+            self._normalized[i] = valid
+            self._invalid_urls[i] = invalid
+            
     def check_yt_dlp(self) -> bool:
         """检查yt-dlp是否已安装"""
-        try:
-            result = subprocess.run(['yt-dlp', '--version'], 
-                                  capture_output=True, text=True, check=True)
-            logger.info(f"yt-dlp版本: {result.stdout.strip()}")
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        version = _yt_dlp_version(self._yt_dlp)
+        if version is None:
             logger.error("yt-dlp未安装或不在PATH中")
             logger.info("请先安装yt-dlp: pip install yt-dlp")
             return False
+        logger.info("yt-dlp版本: %s (%s)", version, self._yt_dlp)
+        return True
             
-    def build_command(self, url: str, download_path: str) -> List[str]:
-        """构建yt-dlp命令"""
-        options = self.config.get('yt_dlp_options', {})
-        
-        cmd = ['yt-dlp']
+    def _resolve_fixed_args(self, options: Dict[str, Any]) -> Tuple[str, ...]:
+        """把yt-dlp选项解析为命令中与URL无关的固定参数"""
+        # 输出经管道逐行转发，进度也按行输出
+        cmd = [self._yt_dlp, '--newline']
         
         # 格式选择
         if options.get('format'):
@@ -95,126 +298,317 @@ class VideoDownloader:
         if options.get('cookies_from_browser'):
             cmd.extend(['--cookies-from-browser', options['cookies_from_browser']])
             
-        # 输出模板
-        if options.get('output_template'):
-            output_path = os.path.join(download_path, options['output_template'])
-            cmd.extend(['-o', output_path])
+        # 分片（HLS/DASH）并发下载数
+        if options.get('concurrent_fragments'):
+            cmd.extend(['-N', str(options['concurrent_fragments'])])
             
-        # 添加URL
-        cmd.append(url)
+        # 外部下载器，例如 aria2c 多连接下载
+        external_downloader = options.get('external_downloader')
+        if external_downloader:
+            cmd.extend(['--downloader', external_downloader])
+            downloader_args = options.get('external_downloader_args',
+                                          DEFAULT_EXTERNAL_DOWNLOADER_ARGS.get(external_downloader))
+            if downloader_args:
+                cmd.extend(['--downloader-args', f"{external_downloader}:{downloader_args}"])
+            
+        return tuple(cmd)
+        
+    def _output_path(self, download_path: str) -> str:
+        """
+        输出模板是唯一与下载路径相关的选项；始终拼成绝对路径，
+        这样启动yt-dlp时无需切换工作目录
+        """
+        return os.path.join(os.path.abspath(download_path), self._output_template)
+        
+    def build_command(self, url: str, download_path: str, extra_args: Sequence[str] = ()) -> List[str]:
+        """构建yt-dlp命令"""
+        return [*self._fixed_args, *extra_args, '-o', self._output_path(download_path), url]
+        
+    def build_batch_command(self, batch_file: str, download_path: str) -> List[str]:
+        """构建从批量文件（每行一个URL）读取URL的yt-dlp命令"""
+        return [*self._fixed_args, '-a', batch_file, '-o', self._output_path(download_path)]
+        
+    @staticmethod
+    def _mirror_outputs(filepaths: List[str], download_path: str, mirror_paths: Sequence[str]) -> None:
+        """
+        把已下载的文件及其同名附属文件（字幕、缩略图等）按相对路径放到其他下载路径，
+        优先使用硬链接，跨文件系统时退回复制
+        """
+        root = os.path.abspath(download_path)
+        for filepath in filepaths:
+            directory, filename = os.path.split(filepath)
+            stem = os.path.splitext(filename)[0]
+            with os.scandir(directory) as it:
+                related = [e.path for e in it
+                           if e.is_file() and (e.name == filename or _is_sidecar(e.name, stem))]
+            for src in related:
+                relative = os.path.relpath(src, root)
+                for mirror_path in mirror_paths:
+                    dst = os.path.join(os.path.abspath(mirror_path), relative)
+                    if os.path.exists(dst):
+                        continue
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    try:
+                        os.link(src, dst)
+                    except OSError:
+                        shutil.copy2(src, dst)
+                        
+    def _check_writable(self, download_path: str) -> bool:
+        """检查下载路径能否创建且可写，结果按路径缓存"""
+        if download_path not in self._writable_cache:
+            try:
+                os.makedirs(download_path, exist_ok=True)
+                writable = os.access(download_path, os.W_OK)
+            except OSError as e:
+                logger.debug("无法创建下载路径 %s: %s", download_path, e)
+                writable = False
+            if writable:
+                self._mkdir_cache.add(download_path)
+            self._writable_cache[download_path] = writable
+        return self._writable_cache[download_path]
+        
+    async def _ensure_dir(self, download_path: str) -> None:
+        """
+        确保下载路径存在，每个路径只创建一次
+        
+        mkdir放到线程中执行，网络盘较慢时不阻塞事件循环；所有协程都在同一事件循环线程中
+        检查缓存，无需加锁，偶尔重复创建也因 exist_ok 而无害
+        """
+        if download_path in self._mkdir_cache:
+            return
+        await asyncio.to_thread(os.makedirs, download_path, exist_ok=True)
+        self._mkdir_cache.add(download_path)
         
-        return cmd
+    async def _run_yt_dlp(self, cmd: List[str], url: str, description: str) -> Tuple[int, int]:
+        """
+        启动yt-dlp并实时转发其输出
         
-    def download_url(self, url: str, download_path: str, description: str) -> bool:
-        """下载单个URL"""
-        logger.info(f"开始下载: {description}")
-        logger.info(f"URL: {url}")
-        logger.info(f"下载路径: {download_path}")
+        Returns:
+            (返回码, 输出中 ERROR: 行的数量)
+        """
+        await self._host_throttlers[urlparse(url).netloc]()
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            env=CHILD_ENV, limit=STREAM_LIMIT)
+        # 逐行转发输出，并加上描述前缀，便于区分并发的多个下载
+        error_count = 0
+        async for line in proc.stdout:
+            text = line.decode('utf-8', errors='replace')
+            if text.startswith('ERROR:'):
+                error_count += 1
+            # 不逐行强制刷新：终端上stdout本身按行缓冲，重定向到文件时则按块写入，减少写调用
+            print(f"[{description}] {text}", end='')
+        return await proc.wait(), error_count
         
-        # 确保下载路径存在
-        Path(download_path).mkdir(parents=True, exist_ok=True)
+    async def download_url(self, url: str, download_path: str, description: str,
+                           mirror_paths: Sequence[str] = ()) -> bool:
+        """
+        下载单个URL
         
-        # 构建命令
-        cmd = self.build_command(url, download_path)
-        logger.info(f"执行命令: {' '.join(cmd)}")
+        Args:
+            url: 视频URL
+            download_path: 下载路径
+            description: 描述
+            mirror_paths: 同一URL的其他下载路径，下载完成后链接过去而不重复下载
+        """
+        logger.info("开始下载: %s", description)
+        logger.info("URL: %s", url)
+        logger.info("下载路径: %s", download_path)
         
+        filepaths_file = None
+        # 准备工作也放在try中，单个路径无法创建时只算本项失败，不影响其他并发下载
         try:
-            # 执行下载 - 实时显示yt-dlp输出
-            print(f"\n{'='*60}")
-            print(f"开始下载: {description}")
-            print(f"{'='*60}")
+            # 确保下载路径存在
+            await self._ensure_dir(download_path)
             
-            result = subprocess.run(cmd, cwd=download_path, text=True, encoding='utf-8')
+            # 需要镜像到其他路径时，让yt-dlp把最终文件路径写入临时文件
+            extra_args: List[str] = []
+            if mirror_paths:
+                import tempfile
+                fd, filepaths_file = tempfile.mkstemp(suffix='.txt')
+                os.close(fd)
+                extra_args = ['--print-to-file', 'after_move:filepath', filepaths_file]
             
-            if result.returncode == 0:
-                logger.info(f"下载成功: {description}")
+            # 构建命令
+            cmd = self.build_command(url, download_path, extra_args)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("执行命令: %s", shlex.join(cmd))
+            
+            # 执行下载 - 实时显示yt-dlp输出
+            returncode, _ = await self._run_yt_dlp(cmd, url, description)
+            
+            if returncode == 0:
+                logger.info("下载成功: %s", description)
+                if filepaths_file:
+                    with open(filepaths_file, 'r', encoding='utf-8') as f:
+                        filepaths = [line.strip() for line in f if line.strip()]
+                    await asyncio.to_thread(self._mirror_outputs, filepaths, download_path, mirror_paths)
+                    logger.info("已链接到其他下载路径: %s", mirror_paths)
                 return True
             else:
-                logger.error(f"下载失败: {description}")
+                logger.error("下载失败: %s", description)
                 return False
                 
         except Exception as e:
-            logger.error(f"下载异常: {description} - {str(e)}")
+            logger.error("下载异常: %s - %s", description, e)
             return False
+        finally:
+            if filepaths_file:
+                os.remove(filepaths_file)
+            
+    async def download_batch(self, urls: List[str], download_path: str, description: str) -> int:
+        """
+        用一次yt-dlp调用下载同一路径下的多个URL，只需启动一次yt-dlp并读取一次cookies
+        
+        yt-dlp遇到错误时会继续下载后续URL，失败数根据输出中的 ERROR: 行估计
+        
+        Returns:
+            成功下载的URL数量
+        """
+        logger.info("开始批量下载: %s（%d 个URL）", description, len(urls))
+        logger.info("下载路径: %s", download_path)
+        
+        batch_file = None
+        try:
+            await self._ensure_dir(download_path)
+            
+            # URL写入批量文件交给 yt-dlp -a 读取，不受命令行长度限制
+            import tempfile
+            fd, batch_file = tempfile.mkstemp(suffix='.txt')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(urls) + '\n')
+            
+            cmd = self.build_batch_command(batch_file, download_path)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("执行命令: %s", shlex.join(cmd))
+            
+            returncode, error_count = await self._run_yt_dlp(cmd, urls[0], description)
+        except Exception as e:
+            logger.error("下载异常: %s - %s", description, e)
+            return 0
+        finally:
+            if batch_file:
+                os.remove(batch_file)
             
+        failed = 0 if returncode == 0 else (min(error_count, len(urls)) or len(urls))
+        if failed:
+            logger.error("批量下载部分失败: %s（失败 %d/%d）", description, failed, len(urls))
+        else:
+            logger.info("批量下载成功: %s", description)
+        return len(urls) - failed
+            
+    async def _gather_bounded(self, coros: List[Awaitable[Any]]) -> List[Any]:
+        """并发执行多个下载协程，同时运行的yt-dlp进程数受 concurrency 限制"""
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(coro: Awaitable[Any]) -> Any:
+            async with sem:
+                return await coro
+
+        return await asyncio.gather(*(bounded(coro) for coro in coros))
+
     def download_all(self) -> None:
-        """下载所有配置的视频"""
+        """下载所有配置的视频（同步入口）"""
+        _import_asyncio().run(self.download_all_async())
+        
+    async def download_all_async(self) -> None:
+        """下载所有配置的视频，所有yt-dlp进程都在同一个事件循环中并发监督"""
         if not self.check_yt_dlp():
             return
             
-        download_configs = self.config.get('download_configs', [])
+        download_configs = self.config.get('download_configs') or []
         
         if not download_configs:
             logger.warning("配置文件中没有找到下载配置")
             return
             
         total_configs = len(download_configs)
-        logger.info(f"共找到 {total_configs} 个下载配置")
+        logger.info("共找到 %d 个下载配置", total_configs)
         
         success_count = 0
         fail_count = 0
+        # URL -> [(下载路径, 描述)]，同一URL出现在多个配置中时只下载一次
+        plan: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        # 下载路径 -> 配置描述
+        group_descriptions: Dict[str, str] = {}
         
         for i, config in enumerate(download_configs, 1):
-            logger.info(f"\n{'='*50}")
-            logger.info(f"处理配置 {i}/{total_configs}")
+            logger.info("\n%s", _SEP50)
+            logger.info("处理配置 %d/%d", i, total_configs)
             
             download_path = config.get('download_path', '')
             description = config.get('description', '未知')
-            urls = config.get('urls', [])
+            urls = config.get('urls') or []
             
             if not download_path:
-                logger.error(f"配置 {i} 缺少下载路径")
+                logger.error("配置 %d 缺少下载路径", i)
                 fail_count += 1
                 continue
                 
             if not urls:
-                logger.warning(f"配置 {i} 没有URL")
+                logger.warning("配置 %d 没有URL", i)
                 continue
                 
-            logger.info(f"配置描述: {description}")
-            logger.info(f"URL数量: {len(urls)}")
-            
-            # 下载每个URL
-            for j, url_config in enumerate(urls, 1):
-                logger.info(f"\n下载 URL {j}/{len(urls)}")
-                
-                # 兼容旧格式（字符串）和新格式（字典）
-                if isinstance(url_config, str):
-                    url = url_config
-                    url_description = f"{description} - {j}"
-                else:
-                    url = url_config.get('url', '')
-                    url_description = url_config.get('description', f"{description} - {j}")
+            # 启动任何下载之前先确认路径可写，避免yt-dlp下载完才在写入时失败；
+            # 没有URL的配置组不检查，以免为其创建空目录
+            if not await asyncio.to_thread(self._check_writable, download_path):
+                logger.error("配置 %d 的下载路径不可写，跳过: %s", i, download_path)
+                fail_count += 1
+                continue
                 
-                if not url:
-                    logger.error(f"URL配置 {j} 缺少URL")
-                    fail_count += 1
-                    continue
+            logger.info("配置描述: %s", description)
+            logger.info("URL数量: %d", len(urls))
+            group_descriptions.setdefault(download_path, description)
+            
+            # 收集每个URL（加载配置时已统一格式并校验）
+            for j in self._invalid_urls[i - 1]:
+                logger.error("URL配置 %d 缺少URL或URL无效", j)
+                fail_count += 1
+            for url, url_description in self._normalized[i - 1]:
+                plan[url].append((download_path, url_description))
                     
-                if self.download_url(url, download_path, url_description):
-                    success_count += 1
-                else:
-                    fail_count += 1
+        # 启用 batch_urls 时，同一路径下的URL合并为一次yt-dlp调用
+        batch_urls = (self.config.get('yt_dlp_options') or {}).get('batch_urls', False)
+        batches: Dict[str, List[str]] = defaultdict(list)
+        coros = []
+        url_counts = []
+        for url, targets in plan.items():
+            download_path, url_description = targets[0]
+            mirror_paths: List[str] = []
+            for path, _ in targets[1:]:
+                if os.path.abspath(path) != os.path.abspath(download_path) and path not in mirror_paths:
+                    mirror_paths.append(path)
+            if len(targets) > 1:
+                logger.info("URL在配置中出现 %d 次，只下载一次: %s", len(targets), url)
+            if batch_urls and not mirror_paths:
+                batches[download_path].append(url)
+                continue
+            coros.append(self.download_url(url, download_path, url_description, mirror_paths))
+            url_counts.append(1)
+        for download_path, urls in batches.items():
+            coros.append(self.download_batch(urls, download_path, group_descriptions[download_path]))
+            url_counts.append(len(urls))
+                    
+        if coros:
+            logger.info("\n开始下载 %d 个URL（并发数: %d）", sum(url_counts), self.concurrency)
+            results = await self._gather_bounded(coros)
+            success_count += sum(results)
+            fail_count += sum(url_counts) - sum(results)
                     
-        logger.info(f"\n{'='*50}")
-        logger.info(f"下载完成! 成功: {success_count}, 失败: {fail_count}")
+        logger.info("\n%s", _SEP50)
+        logger.info("下载完成! 成功: %d, 失败: %d", success_count, fail_count)
         
     def interactive_add_config(self) -> None:
         """交互式添加配置"""
         print("\n=== 添加新的下载配置 ===")
 
-        # 获取现有的配置组（配置描述和路径的映射）
-        existing_configs = {}
-        for config in self.config.get('download_configs', []):
-            desc = config.get('description', '').strip()
-            path = config.get('download_path', '').strip()
-            if desc and path:
-                existing_configs[desc] = path
+        # 现有的配置组（配置描述 -> 配置组）
+        existing_configs = self._by_desc
 
         if existing_configs:
             print("\n现有的配置组:")
-            for i, (desc, path) in enumerate(existing_configs.items(), 1):
-                print(f"{i}. {desc} -> {path}")
+            for i, (desc, config) in enumerate(existing_configs.items(), 1):
+                print(f"{i}. {desc} -> {config['download_path'].strip()}")
 
             choice = input("\n选择操作:\n1. 向现有配置组添加URL\n2. 创建新配置组\n请选择 (1/2): ").strip()
 
@@ -223,25 +617,15 @@ class VideoDownloader:
                     config_index = int(input("请选择配置组编号: ")) - 1
                     configs_list = list(existing_configs.items())
                     if 0 <= config_index < len(configs_list):
-                        selected_desc, selected_path = configs_list[config_index]
+                        selected_desc, target_config = configs_list[config_index]
                         print(f"选择的配置组: {selected_desc}")
-                        print(f"对应路径: {selected_path}")
-
-                        # 找到对应的配置
-                        target_config = None
-                        for config in self.config.get('download_configs', []):
-                            if config.get('description') == selected_desc:
-                                target_config = config
-                                break
-
-                        if target_config:
-                            urls_added = self._add_urls_to_config(target_config, selected_desc)
-                            if urls_added > 0 and self._save_config():
-                                print(f"成功向配置组 '{selected_desc}' 添加了 {urls_added} 个URL")
-                            elif urls_added == 0:
-                                print("未添加任何URL")
-                        else:
-                            print(f"未找到配置组: {selected_desc}")
+                        print(f"对应路径: {target_config['download_path'].strip()}")
+
+                        urls_added = self._add_urls_to_config(target_config, selected_desc)
+                        if urls_added > 0 and self._save_config():
+                            print(f"成功向配置组 '{selected_desc}' 添加了 {urls_added} 个URL")
+                        elif urls_added == 0:
+                            print("未添加任何URL")
                         return
                     else:
                         print("无效的配置组编号")
@@ -260,18 +644,17 @@ class VideoDownloader:
         description = input("请输入配置组名称: ").strip()
 
         # 检查配置组名称是否已存在
-        if description in existing_configs:
+        if description in self._by_desc:
             print(f"配置组 '{description}' 已存在，请使用不同的名称")
             return
 
         download_path = input("请输入下载路径: ").strip()
 
         # 检查路径是否已被其他配置组使用
-        for existing_desc, existing_path in existing_configs.items():
-            if existing_path == download_path:
-                print(f"路径 '{download_path}' 已被配置组 '{existing_desc}' 使用")
-                print("每个配置组必须对应唯一的下载路径")
-                return
+        if download_path in self._paths:
+            print(f"路径 '{download_path}' 已被配置组 '{self._paths[download_path]}' 使用")
+            print("每个配置组必须对应唯一的下载路径")
+            return
 
         # 创建新配置组
         new_config = {
@@ -287,6 +670,8 @@ class VideoDownloader:
             print("输入不完整，取消添加")
             return
 
+        if self.config.get('download_configs') is None:
+            self.config['download_configs'] = []
         self.config['download_configs'].append(new_config)
 
         # 保存配置文件
@@ -297,18 +682,39 @@ class VideoDownloader:
             self.config['download_configs'].pop()
 
     def _save_config(self) -> bool:
-        """保存配置文件"""
+        """
+        保存配置文件
+        
+        先写入 config.json.tmp 再原子替换，写入中途崩溃也不会损坏原配置文件
+        """
+        # 无论保存是否成功，进程内缓存都可能与磁盘不一致，直接失效
+        self._config_cache.pop(os.path.abspath(self.config_file), None)
+        tmp_file = self.config_file + '.tmp'
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
+            with open(tmp_file, 'wb') as f:
+                f.write(_dumps(self.config))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.config_file)
+            self._build_indexes()
             return True
         except Exception as e:
             print(f"保存配置失败: {e}")
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
             return False
 
     def _add_urls_to_config(self, target_config: dict, config_desc: str) -> int:
         """向指定配置添加URL，返回添加的URL数量"""
+        if target_config.get('urls') is None:
+            target_config['urls'] = []
         print(f"\n向配置组 '{config_desc}' 添加URL:")
+        mode = input("输入方式:\n1. 逐条输入\n2. 批量粘贴\n请选择 (1/2，默认1): ").strip()
+        if mode == '2':
+            return self._paste_urls_to_config(target_config)
+
         print("请输入URL和描述（输入空行结束）:")
         urls_added = 0
 
@@ -316,6 +722,9 @@ class VideoDownloader:
             url = input("URL: ").strip()
             if not url:
                 break
+            if not _URL_RE.match(url):
+                print("无效的URL（需以 http:// 或 https:// 开头），已忽略")
+                continue
             url_description = input("描述: ").strip()
             if not url_description:
                 url_description = f"视频 {len(target_config['urls']) + urls_added + 1}"
@@ -328,39 +737,58 @@ class VideoDownloader:
 
         return urls_added
 
+    def _paste_urls_to_config(self, target_config: dict) -> int:
+        """一次读入粘贴的多行文本并批量添加URL，返回添加的URL数量"""
+        print("请粘贴URL，每行一个，可在URL后用 '# 描述' 添加描述")
+        print("粘贴完成后按 Ctrl-D（Windows 下为 Ctrl-Z 后回车）结束:")
+        entries = []
+        for line in sys.stdin.read().splitlines():
+            match = _PASTE_LINE_RE.match(line)
+            if match:
+                entries.append((match[1], match[2] or ''))
+            elif line.strip():
+                # 不以 http:// 或 https:// 开头的行不会被添加，提示用户
+                print(f"无效的URL，已忽略: {line.strip()}")
+        start = len(target_config['urls'])
+        target_config['urls'].extend(
+            {"url": url, "description": desc.strip() or f"视频 {start + i}"}
+            for i, (url, desc) in enumerate(entries, 1)
+        )
+        return len(entries)
+
     def list_configs(self) -> None:
         """列出所有配置组"""
-        download_configs = self.config.get('download_configs', [])
+        download_configs = self.config.get('download_configs') or []
 
         if not download_configs:
             print("没有找到任何配置组")
             return
 
         print(f"\n共找到 {len(download_configs)} 个配置组：")
-        print("="*80)
+        print(_SEP80)
 
         for i, config in enumerate(download_configs, 1):
             desc = config.get('description', '无描述')
             path = config.get('download_path', '无路径')
-            url_count = len(config.get('urls', []))
+            url_count = len(config.get('urls') or [])
 
             print(f"{i}. 配置组: {desc}")
             print(f"   对应路径: {path}")
             print(f"   URL数量: {url_count}")
 
             # 显示URL详情
-            urls = config.get('urls', [])
+            urls = config.get('urls') or []
             for j, url_config in enumerate(urls, 1):
                 if isinstance(url_config, str):
                     print(f"   URL {j}: {url_config}")
                 else:
                     print(f"   URL {j}: {url_config.get('description', '无描述')}")
                     print(f"         {url_config.get('url', '无URL')}")
-            print("-"*80)
+            print(_DASH80)
             
     def interactive_add_url(self) -> None:
         """交互式向现有配置组添加URL"""
-        download_configs = self.config.get('download_configs', [])
+        download_configs = self.config.get('download_configs') or []
 
         if not download_configs:
             print("没有找到任何配置组")
@@ -370,7 +798,7 @@ class VideoDownloader:
         for i, config in enumerate(download_configs):
             desc = config.get('description', '无描述')
             path = config.get('download_path', '无路径')
-            url_count = len(config.get('urls', []))
+            url_count = len(config.get('urls') or [])
             print(f"{i+1}. {desc} -> {path} (已有{url_count}个URL)")
 
         try:
@@ -406,7 +834,7 @@ class VideoDownloader:
             
     def interactive_select_download(self) -> None:
         """交互式选择特定URL下载"""
-        download_configs = self.config.get('download_configs', [])
+        download_configs = self.config.get('download_configs') or []
         
         if not download_configs:
             print("没有找到任何配置")
@@ -414,31 +842,24 @@ class VideoDownloader:
             
         # 显示所有配置和URL
         print("\n=== 可用的下载项目 ===")
-        url_list = []
+        url_list = [
+            {
+                'config_index': i,
+                'url': url,
+                'description': url_description,
+                'download_path': config.get('download_path', '')
+            }
+            for i, config in enumerate(download_configs)
+            for url, url_description in self._normalized[i]
+        ]
         
+        number = 0
         for i, config in enumerate(download_configs):
             print(f"\n配置 {i+1}: {config.get('description', '无描述')}")
             print(f"路径: {config.get('download_path', '无路径')}")
             
-            urls = config.get('urls', [])
-            for j, url_config in enumerate(urls):
-                url_index = len(url_list) + 1
-                
-                if isinstance(url_config, str):
-                    url = url_config
-                    url_description = f"视频 {j+1}"
-                else:
-                    url = url_config.get('url', '')
-                    url_description = url_config.get('description', f"视频 {j+1}")
-                
-                url_list.append({
-                    'config_index': i,
-                    'url': url,
-                    'description': url_description,
-                    'download_path': config.get('download_path', '')
-                })
-                
-                print(f"  {url_index}. {url_description}")
+            for number, (_, url_description) in enumerate(self._normalized[i], number + 1):
+                print(f"  {number}. {url_description}")
                 
         if not url_list:
             print("没有找到任何URL")
@@ -477,29 +898,46 @@ class VideoDownloader:
                 print("请输入有效的数字")
                 continue
         
-        # 下载选中的URL
-        print(f"\n开始下载 {len(selected_indices)} 个项目...")
-        success_count = 0
-        fail_count = 0
+        # 同一URL和下载路径只下载一次，避免两个yt-dlp同时写同一个文件
+        selected_items = []
+        seen: Set[Tuple[str, str]] = set()
+        for i in selected_indices:
+            item = url_list[i]
+            key = (item['url'], os.path.abspath(item['download_path']))
+            if key in seen:
+                logger.info("重复的下载项目，只下载一次: %s", item['description'])
+                continue
+            seen.add(key)
+            selected_items.append(item)
         
-        for i, url_index in enumerate(selected_indices, 1):
-            url_info = url_list[url_index]
-            print(f"\n下载进度: {i}/{len(selected_indices)}")
-            
-            if self.download_url(url_info['url'], url_info['download_path'], url_info['description']):
-                success_count += 1
-            else:
-                fail_count += 1
+        # 并发下载选中的URL
+        logger.info("\n开始下载 %d 个项目（并发数: %d）...", len(selected_items), self.concurrency)
+        coros = [self.download_url(item['url'], item['download_path'], item['description'])
+                 for item in selected_items]
+        results = _import_asyncio().run(self._gather_bounded(coros))
+        success_count = sum(results)
+        fail_count = len(results) - success_count
                 
-        print(f"\n{'='*50}")
-        print(f"选择性下载完成! 成功: {success_count}, 失败: {fail_count}")
+        logger.info("\n%s", _SEP50)
+        logger.info("选择性下载完成! 成功: %d, 失败: %d", success_count, fail_count)
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="视频下载器 - 配置组管理系统")
+    parser.add_argument('command', nargs='?',
+                        help="add / addurl / list / download / select")
+    parser.add_argument('-j', '--jobs', '--concurrency', dest='concurrency', type=int,
+                        help=f"同时运行的yt-dlp进程数（默认读取 yt_dlp_options.concurrency，"
+                             f"未配置时为 {DEFAULT_CONCURRENCY}）")
+    return parser.parse_args()
 
 def main():
     """主函数"""
-    downloader = VideoDownloader()
+    args = parse_args()
+    downloader = VideoDownloader(concurrency=args.concurrency)
     
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
+    if args.command:
+        command = args.command
         if command == 'add':
             downloader.interactive_add_config()
         elif command == 'addurl':
@@ -521,6 +959,7 @@ def main():
         print("  python download.py list     - 列出所有配置组")
         print("  python download.py download - 下载所有配置组的视频")
         print("  python download.py select   - 选择性下载特定视频")
+        print("  可选参数: --jobs N          - 同时运行的下载进程数")
         
         choice = input("\n请选择操作 (add/addurl/list/download/select): ").strip().lower()
         if choice == 'add':
@@ -7,67 +7,92 @@
 
 import re
 import os
-import glob
-from datetime import datetime
-
-
-def parse_srt_time(time_str):
-    """将SRT时间格式转换为ASS时间格式"""
-    # SRT格式: 00:00:07,560 --> 00:00:08,300
-    # ASS格式: 0:00:07.56
-    time_str = time_str.replace(',', '.')
-    parts = time_str.split(':')
-    hours = int(parts[0])
-    minutes = int(parts[1])
-    seconds = float(parts[2])
+import argparse
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+
+# 合并时添加的字幕样式 - 增大字体到42，提高字幕位置到90
+SUBTITLE_STYLE = "Style: Subtitle,黑体,42,&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,1,0,0,0,100,100,0.00,0.00,1,2.0,0,2,20,20,90,1"
+
+# SRT字幕对应的对话行，预先绑定 str.format
+_DIALOGUE_FORMAT = 'Dialogue: 0,{},{},Subtitle,,0,0,0,,{}'.format
+
+# 字幕文本转义: 换行符转为\N，花括号转义，一次扫描完成
+_ASS_ESCAPE = str.maketrans({'\n': '\\N', '{': '\\{', '}': '\\}'})
+
+# SRT时间行: 00:00:07,560 --> 00:00:08,300 -> ASS时间: 0:00:07.56 和 0:00:08.30
+# 从行首匹配两个时间，其后的内容（如位置坐标 X1:10 X2:20）忽略；
+# 毫秒截断到百分之一秒，ASS格式不需要前导零的小时
+_SRT_TIME_RE = re.compile(r'(\d+):(\d\d):(\d\d),(\d\d)\d --> (\d+):(\d\d):(\d\d),(\d\d)\d')
+
+
+def _make_subtitle(index, time_line, text_lines):
+    """由一个字幕块的各行构建字幕字典，时间行无效时返回None"""
+    m = _SRT_TIME_RE.match(time_line)
+    if not m:
+        return None
+    start = f"{int(m[1])}:{m[2]}:{m[3]}.{m[4]}"
+    end = f"{int(m[5])}:{m[6]}:{m[7]}.{m[8]}"
+    return {
+        'index': index,
+        'start': start,
+        'end': end,
+        'text': '\n'.join(text_lines)
+    }
+
+
+def _iter_srt_blocks(lines):
+    """
+    逐行解析SRT内容，每遇到空行结束一个字幕块
+
+    Yields:
+        字幕字典
+    """
+    index = time_line = None
+    text_lines = []
+    
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            # 空行: 结束当前字幕块（序号、时间、内容都齐全才有效）
+            if text_lines:
+                subtitle = _make_subtitle(index, time_line, text_lines)
+                if subtitle:
+                    yield subtitle
+            index = time_line = None
+            text_lines = []
+        elif index is None:
+            # 序号
+            index = stripped
+        elif time_line is None:
+            # 时间
+            time_line = stripped
+        else:
+            # 字幕内容（可能有多行）
+            text_lines.append(line.rstrip('\n'))
     
-    # ASS格式不需要前导零的小时
-    return f"{hours}:{minutes:02d}:{seconds:06.2f}"
+    # 文件末尾没有空行时，处理最后一个字幕块
+    if text_lines:
+        subtitle = _make_subtitle(index, time_line, text_lines)
+        if subtitle:
+            yield subtitle
 
 
 def parse_srt_file(srt_path):
     """解析SRT文件"""
-    subtitles = []
-    
+    # 逐行流式解析，不再整体读入后按空行分割
     try:
         with open(srt_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+            return list(_iter_srt_blocks(f))
     except UnicodeDecodeError:
         # 如果UTF-8解码失败，尝试其他编码
         try:
             with open(srt_path, 'r', encoding='gbk') as f:
-                content = f.read()
+                return list(_iter_srt_blocks(f))
         except UnicodeDecodeError:
             print(f"无法读取SRT文件: {srt_path}")
-            return subtitles
-    
-    # 按空行分割字幕块
-    blocks = content.strip().split('\n\n')
-    
-    for block in blocks:
-        lines = block.strip().split('\n')
-        if len(lines) >= 3:
-            # 序号
-            index = lines[0]
-            # 时间
-            time_line = lines[1]
-            # 字幕内容（可能有多行）
-            subtitle_text = '\n'.join(lines[2:])
-            
-            # 解析时间
-            time_match = re.match(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})', time_line)
-            if time_match:
-                start_time = parse_srt_time(time_match.group(1))
-                end_time = parse_srt_time(time_match.group(2))
-                
-                subtitles.append({
-                    'index': index,
-                    'start': start_time,
-                    'end': end_time,
-                    'text': subtitle_text
-                })
-    
-    return subtitles
+            return []
 
 
 def read_ass_file(ass_path):
@@ -85,6 +110,14 @@ def read_ass_file(ass_path):
             return ""
 
 
+def _find_section(content, header, start=0):
+    """查找以 header 开头的行，返回该行的起始位置，找不到时返回-1"""
+    if start == 0 and content.startswith(header):
+        return 0
+    pos = content.find('\n' + header, start)
+    return pos + 1 if pos != -1 else -1
+
+
 def merge_ass_srt(ass_path, srt_path, output_path):
     """合并ASS和SRT文件"""
     print(f"正在合并: {os.path.basename(ass_path)} + {os.path.basename(srt_path)}")
@@ -102,50 +135,42 @@ def merge_ass_srt(ass_path, srt_path, output_path):
     
     print(f"  SRT文件中找到 {len(srt_subtitles)} 条字幕")
     
-    # 分析ASS文件结构
-    lines = ass_content.split('\n')
-    
-    # 找到样式定义部分，添加新的字幕样式
-    style_section_found = False
-    events_section_found = False
-    output_lines = []
-    
-    for line in lines:
-        if line.strip() == '[V4+ Styles]':
-            style_section_found = True
-            output_lines.append(line)
-        elif line.strip() == '[Events]':
-            events_section_found = True
-            # 在Events部分之前添加字幕样式
-            if style_section_found:
-                # 添加字幕样式 - 增大字体到42，提高字幕位置到90
-                subtitle_style = "Style: Subtitle,黑体,42,&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,1,0,0,0,100,100,0.00,0.00,1,2.0,0,2,20,20,90,1"
-                output_lines.append(subtitle_style)
-            output_lines.append(line)
-        elif line.strip().startswith('[') and events_section_found:
-            # 在Events部分结束前添加SRT字幕
-            # 添加SRT字幕作为对话
-            for sub in srt_subtitles:
-                # 清理字幕文本，移除换行符并转义特殊字符
-                clean_text = sub['text'].replace('\n', '\\N').replace('{', '\\{').replace('}', '\\}')
-                dialogue_line = f"Dialogue: 0,{sub['start']},{sub['end']},Subtitle,,0,0,0,,{clean_text}"
-                output_lines.append(dialogue_line)
-            
-            output_lines.append(line)
-        else:
-            output_lines.append(line)
+    # 直接在整段文本中查找各部分的标题行，不再逐行比较
+    events_pos = _find_section(ass_content, '[Events]')
+    styles_pos = _find_section(ass_content, '[V4+ Styles]')
+    style_section_found = styles_pos != -1 and (events_pos == -1 or styles_pos < events_pos)
+    # [Events]之后的下一个部分，没有时为-1
+    next_section_pos = _find_section(ass_content, '[', events_pos + 1) if events_pos != -1 else -1
     
-    # 如果没有找到其他部分，直接在最后添加SRT字幕
-    if events_section_found and not any(line.strip().startswith('[') and line.strip() != '[Events]' for line in lines[lines.index('[Events]')+1:]):
-        for sub in srt_subtitles:
-            clean_text = sub['text'].replace('\n', '\\N').replace('{', '\\{').replace('}', '\\}')
-            dialogue_line = f"Dialogue: 0,{sub['start']},{sub['end']},Subtitle,,0,0,0,,{clean_text}"
-            output_lines.append(dialogue_line)
+    # SRT字幕作为对话，一次拼接成完整的文本块
+    # 清理字幕文本，移除换行符并转义特殊字符
+    dialogue_text = '\n'.join(
+        _DIALOGUE_FORMAT(sub['start'], sub['end'], sub['text'].translate(_ASS_ESCAPE))
+        for sub in srt_subtitles
+    )
     
-    # 写入输出文件
+    # 写入输出文件，各部分直接写入大缓冲区的文件，不再拼出完整的输出列表
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(output_lines))
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            if events_pos == -1:
+                # 没有Events部分，保持原样输出
+                f.write(ass_content)
+            else:
+                f.write(ass_content[:events_pos])
+                # 在Events部分之前添加字幕样式
+                if style_section_found:
+                    f.write(SUBTITLE_STYLE)
+                    f.write('\n')
+                # Events部分原有内容，随后在其结束前添加SRT字幕，再接上其后的其他部分
+                if next_section_pos == -1:
+                    f.write(ass_content[events_pos:])
+                    f.write('\n')
+                    f.write(dialogue_text)
+                else:
+                    f.write(ass_content[events_pos:next_section_pos])
+                    f.write(dialogue_text)
+                    f.write('\n')
+                    f.write(ass_content[next_section_pos:])
         print(f"  合并完成: {os.path.basename(output_path)}")
         return True
     except Exception as e:
@@ -153,51 +178,62 @@ def merge_ass_srt(ass_path, srt_path, output_path):
         return False
 
 
-def find_matching_srt_files(ass_file_path):
-    """根据ASS文件路径，查找匹配的SRT文件"""
-    # 获取ASS文件的基本名称（去掉.danmaku.ass扩展名）
-    base_name = ass_file_path.replace('.danmaku.ass', '')
-
-    # 获取目录和文件名
-    directory = os.path.dirname(ass_file_path)
-    filename_base = os.path.basename(base_name)
+def _merge_worker(task):
+    """进程池中执行的合并任务，task 为 (ASS文件, SRT文件, 输出文件)"""
+    return merge_ass_srt(*task)
 
-    matching_srt_files = []
 
-    # 使用os.listdir()代替glob.glob()来避免方括号问题
+@lru_cache(maxsize=None)
+def _list_srts(directory):
+    """列出目录中的SRT文件名，每个目录只扫描一次（同一目录通常有多个ASS文件）"""
     try:
-        if os.path.exists(directory):
-            files_in_dir = os.listdir(directory)
-            for file in files_in_dir:
-                # 检查文件是否以基本名称开头并以.srt结尾
-                if file.startswith(filename_base) and file.endswith('.srt'):
-                    # 确保中间有一个点（避免匹配到不相关的文件）
-                    middle_part = file[len(filename_base):-4]  # 去掉.srt
-                    if middle_part.startswith('.') and len(middle_part) > 1:
-                        full_path = os.path.join(directory, file)
-                        matching_srt_files.append(full_path)
-    except Exception as e:
+        with os.scandir(directory or '.') as it:
+            return tuple(entry.name for entry in it if entry.name.endswith('.srt'))
+    except OSError as e:
         print(f"  警告: 扫描目录时出错 {directory}: {e}")
+        return ()
+
 
-    # 去重并排序
-    matching_srt_files = sorted(list(set(matching_srt_files)))
+def find_matching_srt_files(ass_file_path):
+    """根据ASS文件路径，查找匹配的SRT文件"""
+    # 获取目录和文件名的基本名称（去掉.danmaku.ass扩展名）
+    directory = os.path.dirname(ass_file_path)
+    # 确保基本名称后有一个点（避免匹配到不相关的文件）
+    prefix = os.path.basename(ass_file_path).removesuffix('.danmaku.ass') + '.'
+    
+    # 按文件名前缀匹配，不使用glob来避免方括号问题
+    # 点与.srt之间至少还要有一个字符（语言标识）
+    matching_srt_files = [
+        os.path.join(directory, file) for file in _list_srts(directory)
+        if file.startswith(prefix) and len(file) > len(prefix) + 4
+    ]
 
-    return matching_srt_files
+    # 同一目录的文件名不会重复，只需排序
+    return sorted(matching_srt_files)
 
 
 def scan_directory(root_dir):
-    """扫描目录，找到所有.danmaku.ass文件"""
-    ass_files = []
+    """
+    扫描目录，逐个产出所有.danmaku.ass文件
     
+    使用显式栈和 os.scandir 遍历，复用目录项自带的类型信息，避免重复stat；
+    返回生成器，后续处理可以与遍历同时进行
+    """
     print(f"正在扫描目录: {root_dir}")
     
-    # 使用glob模式递归查找所有.danmaku.ass文件
-    pattern = os.path.join(root_dir, '**', '*.danmaku.ass')
-    ass_files = glob.glob(pattern, recursive=True)
-    
-    print(f"找到 {len(ass_files)} 个.danmaku.ass文件")
-    
-    return ass_files
+    stack = [root_dir]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith('.danmaku.ass'):
+                        yield entry.path
+        except OSError as e:
+            # 跳过无法访问的目录，继续扫描其余部分
+            print(f"  警告: 扫描目录时出错 {directory}: {e}")
 
 
 def generate_output_filename(srt_file_path, ass_file_path):
@@ -227,8 +263,26 @@ def generate_output_filename(srt_file_path, ass_file_path):
     return os.path.join(os.path.dirname(ass_file_path), output_filename)
 
 
+def is_up_to_date(output_file, ass_file, srt_file):
+    """输出文件存在且比ASS和SRT文件都新时，无需重新合并"""
+    try:
+        output_mtime = os.stat(output_file).st_mtime
+    except FileNotFoundError:
+        return False
+    return output_mtime > max(os.stat(ass_file).st_mtime, os.stat(srt_file).st_mtime)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="批量合并ASS弹幕文件和SRT字幕文件")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="重新合并所有文件，即使输出文件已是最新")
+    return parser.parse_args()
+
+
 def main():
     """主函数"""
+    args = parse_args()
+    
     # 扫描根目录
     root_directory = r"E:\video\STUDY"
     
@@ -239,15 +293,14 @@ def main():
     # 扫描目录，找到所有.danmaku.ass文件
     ass_files = scan_directory(root_directory)
     
-    if not ass_files:
-        print("未找到任何.danmaku.ass文件")
-        return
-    
-    total_merged = 0
+    total_found = 0
     total_skipped = 0
+    total_up_to_date = 0
+    tasks = []
     
-    # 处理每个ASS文件
+    # 边扫描边处理每个ASS文件，收集合并任务
     for ass_file in ass_files:
+        total_found += 1
         print(f"\n处理文件: {os.path.basename(ass_file)}")
         
         # 查找匹配的SRT文件
@@ -267,20 +320,41 @@ def main():
             # 生成输出文件名
             output_file = generate_output_filename(srt_file, ass_file)
             
+            # 输出文件比输入都新则跳过，增量运行时只合并有变化的文件
+            if not args.force and is_up_to_date(output_file, ass_file, srt_file):
+                print(f"  已是最新，跳过: {os.path.basename(output_file)}")
+                total_up_to_date += 1
+                continue
+            
             # 检查输出文件是否已存在
             if os.path.exists(output_file):
                 print(f"  覆盖现有文件: {os.path.basename(output_file)}")
             
-            # 执行合并
-            if merge_ass_srt(ass_file, srt_file, output_file):
-                total_merged += 1
-            else:
-                total_skipped += 1
+            tasks.append((ass_file, srt_file, output_file))
+    
+    if not total_found:
+        print("未找到任何.danmaku.ass文件")
+        return
+    
+    print(f"\n找到 {total_found} 个.danmaku.ass文件")
+    
+    # 各合并任务相互独立，分发到多个进程并行执行
+    total_merged = 0
+    if tasks:
+        # 每批提交多个任务，摊薄进程间通信开销
+        chunksize = max(1, len(tasks) // ((os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor() as ex:
+            for ok in ex.map(_merge_worker, tasks, chunksize=chunksize):
+                if ok:
+                    total_merged += 1
+                else:
+                    total_skipped += 1
     
     print("\n" + "=" * 60)
     print(f"处理完成！")
     print(f"成功合并: {total_merged} 个文件")
     print(f"跳过: {total_skipped} 个文件")
+    print(f"已是最新: {total_up_to_date} 个文件")
     print("=" * 60)
 
 